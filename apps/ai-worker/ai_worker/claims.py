@@ -0,0 +1,140 @@
+"""Event claiming with a local dedupe filter in front of the MCP claim tools."""
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class EventClaimer:
+    """Idempotency claims that skip the MCP round-trip for known duplicates.
+
+    Keeps one bounded LRU per consumer name of event IDs known to be claimed,
+    so replays and rebalances short-circuit locally. Each event is claimed
+    right before its handler runs, so a crash mid-batch never strands claims.
+
+    While duplicates are expected (startup, a rebalance, or a duplicate just
+    seen) whole batches are also pre-filtered against `processed_events` in
+    one read; once a lookup finds nothing the steady state skips that call.
+    """
+
+    def __init__(self, mcp_client, max_size: int = 100_000):
+        self.mcp_client = mcp_client
+        self.max_size = max_size
+        # consumer_name -> OrderedDict of event IDs
+        self._seen: dict[str, OrderedDict] = {}
+        # (consumer_name, event_id) this worker claimed and then failed
+        self._failed: OrderedDict = OrderedDict()
+        # consumer names whose last batch lookup found no duplicates
+        self._caught_up: set[str] = set()
+        self._lock = threading.Lock()
+        self.local_hits = 0
+
+    def claim(self, tenant_id: str, event_id: str, consumer_name: str) -> bool:
+        """
+        Claim a single event. Returns False if it was already processed.
+
+        Raises if the server could not answer, so the event is retried
+        rather than skipped.
+        """
+        with self._lock:
+            taking_over = self._failed.pop((consumer_name, event_id), None) is not None
+            seen = self._seen.get(consumer_name)
+            if seen is not None and event_id in seen and not taking_over:
+                seen.move_to_end(event_id)
+                self.local_hits += 1
+                self._expect_duplicates(consumer_name)
+                return False
+
+        # On takeover the claim is ours either way; the call just records it
+        # in case the failed attempt never got as far as claiming
+        result = self.mcp_client.claim_event(tenant_id, event_id, consumer_name)
+        if result.get("error") or "claimed" not in result:
+            # No answer from the server: remember nothing, let the caller retry
+            if taking_over:
+                with self._lock:
+                    self._failed[(consumer_name, event_id)] = True
+            raise RuntimeError(f"claim_event failed: {result.get('error', 'no claim result')}")
+
+        with self._lock:
+            self._remember(consumer_name, event_id)
+            if not result["claimed"]:
+                self._expect_duplicates(consumer_name)
+        return taking_over or result["claimed"]
+
+    def prefilter_batch(self, consumer_name: str, event_ids: list[str]):
+        """
+        Look up a consumer batch in one call and remember the already-processed IDs.
+
+        Nothing is claimed here; `claim` does that per event. Skipped unless
+        duplicates are expected, so new events cost no extra round-trip.
+
+        Args:
+            consumer_name: Name of the consumer
+            event_ids: Event IDs in the polled batch
+        """
+        with self._lock:
+            if consumer_name in self._caught_up:
+                return
+            seen = self._seen.get(consumer_name, {})
+            unknown = [event_id for event_id in event_ids if event_id and event_id not in seen]
+        if not unknown:
+            return
+
+        try:
+            result = self.mcp_client.find_processed_events(consumer_name, unknown)
+        except Exception as e:
+            # Handlers still claim each event individually
+            logger.warning(f"Batch prefilter failed: {e}")
+            return
+        if result.get("error"):
+            logger.warning(f"Batch prefilter failed: {result['error']}")
+            return
+
+        found = result.get("event_ids", [])
+        with self._lock:
+            for event_id in found:
+                self._remember(consumer_name, event_id)
+            if not found:
+                # Caught up: back to plain per-event claims
+                self._caught_up.add(consumer_name)
+
+    def expect_duplicates(self):
+        """Pre-filter every consumer's next batches, e.g. after a rebalance."""
+        with self._lock:
+            self._caught_up.clear()
+
+    def mark_failed(self, event_id: str, consumer_name: str):
+        """
+        Let the next `claim` of a failed event succeed on this worker.
+
+        Retries are claimed under their own attempt-specific consumer name, so
+        the original claim is never released. If the event could not be routed
+        to a retry topic it is re-read from the source partition, and this
+        worker must be able to take over the claim it still holds.
+        """
+        with self._lock:
+            self._seen.get(consumer_name, {}).pop(event_id, None)
+            self._failed[(consumer_name, event_id)] = True
+            while len(self._failed) > self.max_size:
+                self._failed.popitem(last=False)
+
+    def warm(self, consumer_name: str, limit: int = 10_000) -> int:
+        """Seed this consumer's filter from the `processed_events` table."""
+        result = self.mcp_client.list_processed_events(consumer_name, limit=min(limit, self.max_size))
+        event_ids = result.get("event_ids", [])
+        with self._lock:
+            # Oldest first so the most recent claims end up least likely to be evicted
+            for event_id in reversed(event_ids):
+                self._remember(consumer_name, event_id)
+        return len(event_ids)
+
+    def _expect_duplicates(self, consumer_name: str):
+        self._caught_up.discard(consumer_name)
+
+    def _remember(self, consumer_name: str, event_id: str):
+        seen = self._seen.setdefault(consumer_name, OrderedDict())
+        seen[event_id] = True
+        seen.move_to_end(event_id)
+        while len(seen) > self.max_size:
+            seen.popitem(last=False)
@@ -1,11 +1,19 @@
 """Kafka consumer for ticket events."""
 import json
 import logging
-from confluent_kafka import Consumer, KafkaError, KafkaException
+import time
+import uuid
+from confluent_kafka import Consumer, KafkaError, KafkaException, TopicPartition
+from confluent_kafka.admin import AdminClient, NewTopic
 from typing import Callable, Optional
 
+from .retry import RetryRouter
+
 logger = logging.getLogger(__name__)
 
+# How long to hold a partition when even the retry topic is unreachable
+ROUTE_FAILURE_BACKOFF_SECONDS = 5.0
+
 class TicketEventConsumer:
     """Consumer for ticket-related Kafka events."""
     
@@ -13,32 +21,93 @@ class TicketEventConsumer:
         self,
         bootstrap_servers: str = "localhost:9092",
         group_id: str = "ai-worker",
-        topics: list[str] = None
+        topics: list[str] = None,
+        retry_router: Optional[RetryRouter] = None,
+        broadcast_topics: list[str] = None,
+        on_assign: Optional[Callable[[], None]] = None
     ):
         self.topics = topics or ["ticket.created"]
+        # Topics every instance must see in full (e.g. to keep a per-process
+        # cache fresh), consumed under a group of their own
+        self.broadcast_topics = broadcast_topics or []
+        self.retry_router = retry_router
+        self.on_assign = on_assign
+        if retry_router:
+            self.topics = self.topics + retry_router.retry_topics
         self.config = {
             "bootstrap.servers": bootstrap_servers,
             "group.id": group_id,
             "auto.offset.reset": "earliest",
             "enable.auto.commit": True,
+            # Offsets are stored only once a message is handled or re-routed
+            "enable.auto.offset.store": False,
+        }
+        self.broadcast_config = {
+            "bootstrap.servers": bootstrap_servers,
+            "group.id": f"{group_id}-broadcast-{uuid.uuid4().hex[:12]}",
+            # Only changes from now on matter; nothing to resume after a restart
+            "auto.offset.reset": "latest",
+            "enable.auto.commit": False,
         }
         self.consumer: Optional[Consumer] = None
+        self.broadcast_consumer: Optional[Consumer] = None
         self.running = False
+        # (topic, partition) -> epoch time at which to resume
+        self._paused: dict[tuple[str, int], float] = {}
     
     def connect(self):
         """Connect to Kafka."""
         logger.info(f"Connecting to Kafka: {self.config['bootstrap.servers']}")
+        self.ensure_topics()
         self.consumer = Consumer(self.config)
-        self.consumer.subscribe(self.topics)
+        self.consumer.subscribe(self.topics, on_assign=self._on_assign, on_revoke=self._on_revoke)
         logger.info(f"Subscribed to topics: {self.topics}")
+        if self.broadcast_topics:
+            self.broadcast_consumer = Consumer(self.broadcast_config)
+            self.broadcast_consumer.subscribe(self.broadcast_topics)
+            logger.info(f"Subscribed to broadcast topics: {self.broadcast_topics}")
+    
+    def ensure_topics(self):
+        """Create subscribed, retry and dead-letter topics if they don't exist yet."""
+        topics = list(dict.fromkeys(self.topics + self.broadcast_topics))
+        if self.retry_router:
+            topics.append(self.retry_router.dead_letter_topic)
+        
+        admin = AdminClient({"bootstrap.servers": self.config["bootstrap.servers"]})
+        futures = admin.create_topics([NewTopic(topic) for topic in topics], request_timeout=10)
+        for topic, future in futures.items():
+            try:
+                future.result()
+                logger.info(f"Created topic: {topic}")
+            except Exception as e:
+                error = e.args[0] if e.args else None
+                if isinstance(error, KafkaError) and error.code() == KafkaError.TOPIC_ALREADY_EXISTS:
+                    continue
+                # Not fatal: the topic may be created later, e.g. by auto-create
+                logger.warning(f"Could not create topic {topic}: {e}")
     
-    def consume(self, handler: Callable[[dict], None], poll_timeout: float = 1.0):
+    def consume(
+        self,
+        handler: Callable[[dict], None],
+        poll_timeout: float = 1.0,
+        batch_handler: Optional[Callable[[list[dict]], None]] = None,
+        batch_size: int = 1,
+        broadcast_handler: Optional[Callable[[dict], None]] = None
+    ):
         """
         Start consuming messages.
         
+        Failed events are handed to the retry router (when configured) so a
+        poisoned or slow event never blocks the rest of its partition.
+        
         Args:
             handler: Callback function to process each message
             poll_timeout: Timeout for polling in seconds
+            batch_handler: Optional callback run once per polled batch, before
+                the per-message handler (e.g. to pre-filter known duplicates)
+            batch_size: Maximum number of messages fetched per poll
+            broadcast_handler: Callback for messages on the broadcast topics;
+                failures are logged, never retried
         """
         if not self.consumer:
             self.connect()
@@ -48,46 +117,143 @@ class TicketEventConsumer:
         
         try:
             while self.running:
-                msg = self.consumer.poll(timeout=poll_timeout)
+                self._resume_due_partitions()
+                if self.broadcast_consumer and broadcast_handler:
+                    self._consume_broadcast(broadcast_handler, batch_size)
+                msgs = self.consumer.consume(num_messages=batch_size, timeout=poll_timeout)
                 
-                if msg is None:
-                    continue
-                
-                if msg.error():
-                    if msg.error().code() == KafkaError._PARTITION_EOF:
-                        logger.debug(f"Reached end of partition {msg.partition()}")
+                # Partitions held during this batch; their later messages are re-fetched
+                held: set[tuple[str, int]] = set()
+                ready = []
+                for msg in msgs:
+                    if msg.error():
+                        if msg.error().code() == KafkaError._PARTITION_EOF:
+                            logger.debug(f"Reached end of partition {msg.partition()}")
+                            continue
+                        elif msg.error().code() == KafkaError.UNKNOWN_TOPIC_OR_PART:
+                            # A subscribed topic doesn't exist (yet); keep serving the others
+                            logger.warning(f"Subscribed topic unavailable: {msg.error()}")
+                            continue
+                        else:
+                            raise KafkaException(msg.error())
+                    
+                    if (msg.topic(), msg.partition()) in held:
                         continue
-                    else:
-                        raise KafkaException(msg.error())
-                
-                try:
-                    # Parse message
-                    key = msg.key().decode("utf-8") if msg.key() else None
-                    value = json.loads(msg.value().decode("utf-8"))
                     
-                    event = {
-                        "topic": msg.topic(),
-                        "partition": msg.partition(),
-                        "offset": msg.offset(),
-                        "key": key,
-                        "value": value,
-                    }
+                    try:
+                        # Parse message
+                        key = msg.key().decode("utf-8") if msg.key() else None
+                        value = json.loads(msg.value().decode("utf-8"))
+                        
+                        event = {
+                            "topic": msg.topic(),
+                            "partition": msg.partition(),
+                            "offset": msg.offset(),
+                            "key": key,
+                            "value": value,
+                        }
+                        if self.retry_router and self.retry_router.is_retry_topic(msg.topic()):
+                            event = self.retry_router.unwrap(event)
+                    except Exception as e:
+                        # Tombstones, bad encodings, malformed envelopes: skip, don't crash
+                        logger.error(f"Failed to parse message: {e}")
+                        self.consumer.store_offsets(message=msg)
+                        continue
                     
-                    logger.info(f"Received event: topic={msg.topic()}, key={key}")
+                    # Retry topics are ordered by due time: hold until the head is due
+                    if event.get("due_at", 0) > time.time():
+                        self._hold(msg, event["due_at"])
+                        held.add((msg.topic(), msg.partition()))
+                        continue
                     
-                    # Call handler
-                    handler(event)
+                    ready.append((msg, event))
+                
+                if not ready:
+                    continue
+                
+                if batch_handler:
+                    try:
+                        batch_handler([event for _, event in ready])
+                    except Exception as e:
+                        logger.error(f"Error processing batch: {e}")
+                
+                # Partitions rewound after a routing failure in the loop below
+                rewound: set[tuple[str, int]] = set()
+                for msg, event in ready:
+                    if (msg.topic(), msg.partition()) in rewound:
+                        continue
                     
-                except json.JSONDecodeError as e:
-                    logger.error(f"Failed to parse message: {e}")
-                except Exception as e:
-                    logger.error(f"Error processing message: {e}")
+                    try:
+                        logger.info(f"Received event: topic={event['topic']}, key={event['key']}")
+                        
+                        # Call handler
+                        handler(event)
+                        
+                    except Exception as e:
+                        logger.error(f"Error processing message: {e}")
+                        if self.retry_router:
+                            try:
+                                self.retry_router.route(event, e)
+                            except Exception as route_error:
+                                # Keep the offset so the event is not lost; try again shortly
+                                logger.error(f"Failed to route event for retry: {route_error}")
+                                self._hold(msg, time.time() + ROUTE_FAILURE_BACKOFF_SECONDS)
+                                rewound.add((msg.topic(), msg.partition()))
+                                continue
+                    
+                    self.consumer.store_offsets(message=msg)
                     
         except KeyboardInterrupt:
             logger.info("Interrupted by user")
         finally:
             self.stop()
     
+    def _consume_broadcast(self, handler: Callable[[dict], None], batch_size: int):
+        """Drain whatever broadcast messages are already fetched, without blocking."""
+        for msg in self.broadcast_consumer.consume(num_messages=batch_size, timeout=0):
+            if msg.error():
+                if msg.error().code() not in (KafkaError._PARTITION_EOF, KafkaError.UNKNOWN_TOPIC_OR_PART):
+                    logger.warning(f"Broadcast consumer error: {msg.error()}")
+                continue
+            try:
+                handler({
+                    "topic": msg.topic(),
+                    "partition": msg.partition(),
+                    "offset": msg.offset(),
+                    "key": msg.key().decode("utf-8") if msg.key() else None,
+                    "value": json.loads(msg.value().decode("utf-8")),
+                })
+            except Exception as e:
+                logger.error(f"Error processing broadcast message: {e}")
+    
+    def _hold(self, msg, resume_at: float):
+        """Pause a partition and rewind it to `msg` until `resume_at`."""
+        tp = TopicPartition(msg.topic(), msg.partition(), msg.offset())
+        self.consumer.pause([tp])
+        self.consumer.seek(tp)
+        self._paused[(msg.topic(), msg.partition())] = resume_at
+        logger.debug(f"Holding {msg.topic()}[{msg.partition()}] for {resume_at - time.time():.1f}s")
+    
+    def _resume_due_partitions(self):
+        """Resume held partitions whose head message is now due."""
+        now = time.time()
+        due = [key for key, resume_at in self._paused.items() if resume_at <= now]
+        if not due:
+            return
+        self.consumer.resume([TopicPartition(topic, partition) for topic, partition in due])
+        for key in due:
+            del self._paused[key]
+    
+    def _on_assign(self, consumer, partitions):
+        """Tell the owner that partitions (and likely replays) were picked up."""
+        if self.on_assign:
+            self.on_assign()
+    
+    def _on_revoke(self, consumer, partitions):
+        """Forget holds on partitions handed to another group member."""
+        for tp in partitions:
+            self._paused.pop((tp.topic, tp.partition), None)
+    
     def stop(self):
         """Stop the consumer."""
         self.running = False
@@ -95,3 +261,7 @@ class TicketEventConsumer:
             logger.info("Closing consumer...")
             self.consumer.close()
             self.consumer = None
+        if self.broadcast_consumer:
+            self.broadcast_consumer.close()
+            self.broadcast_consumer = None
+        self._paused.clear()
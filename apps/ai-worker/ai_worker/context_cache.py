@@ -0,0 +1,188 @@
+"""In-worker cache of ticket contexts, kept fresh by the Kafka events we consume."""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Events that don't change what a context fetched after them would contain
+NOOP_EVENT_TYPES = {"ticket.created"}
+
+
+def _patch_triaged(context: dict, payload: dict):
+    context["status"] = payload.get("newStatus") or "TRIAGED"
+    priority = payload.get("newPriority", payload.get("priority"))
+    if priority is not None:
+        context["priority"] = priority
+
+
+def _patch_assigned(context: dict, payload: dict):
+    context["status"] = "ASSIGNED"
+
+
+def _patch_resolved(context: dict, payload: dict):
+    context["status"] = "RESOLVED"
+    context["resolutionNotes"] = payload.get("resolutionNotes")
+
+
+# Lifecycle events that only change status/priority, not messages: the cached
+# context is patched in place instead of being dropped. Anything else
+# (e.g. message.*) invalidates.
+EVENT_PATCHERS = {
+    "ticket.triaged": _patch_triaged,
+    "ticket.assigned": _patch_assigned,
+    "ticket.resolved": _patch_resolved,
+}
+
+
+class TicketContextCache:
+    """Bounded TTL/LRU cache of `get_ticket_context` results.
+
+    Entries are keyed by (tenant_id, ticket_id). Lifecycle events patch the
+    cached context in place, so the handler reading right after its own event
+    still hits. Every observed change bumps the ticket's version; a fetch that
+    raced with an event is never written back, so a slow read cannot undo it.
+
+    Fetch times are taken from the worker clock but compared with the API's
+    `publishedAt`, so they are recorded `clock_skew_seconds` early: an event
+    published just after a fetch is never mistaken for one it already reflects.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl_seconds: float = 86400.0,
+        clock_skew_seconds: float = 5.0,
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.clock_skew_seconds = clock_skew_seconds
+        # key -> (context, fetched_at wall time, expires_at monotonic, version)
+        self._entries: OrderedDict = OrderedDict()
+        # key -> version; bounded separately so it outlives evicted entries
+        self._versions: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(
+        self,
+        tenant_id: str,
+        ticket_id: str,
+        fetch: Callable[[], dict],
+        not_before: Optional[float] = None,
+    ) -> dict:
+        """
+        Return the cached context or load it with `fetch`.
+
+        Args:
+            tenant_id: Tenant UUID
+            ticket_id: Ticket UUID
+            fetch: Loader called on a miss (e.g. the MCP tool call)
+            not_before: Versioned read - epoch seconds the context must have
+                been fetched after (typically the event's publishedAt)
+        """
+        key = (tenant_id, ticket_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                context, fetched_at, expires_at, _ = entry
+                if expires_at <= time.monotonic():
+                    del self._entries[key]
+                elif not_before is not None and fetched_at < not_before:
+                    del self._entries[key]
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return context
+            self.misses += 1
+            version = self._versions.get(key, 0)
+
+        fetched_at = time.time() - self.clock_skew_seconds
+        context = fetch()
+
+        # Never cache errors ("Ticket not found") or reads that raced an event
+        if not context.get("error"):
+            with self._lock:
+                if self._versions.get(key, 0) == version:
+                    self._entries[key] = (
+                        context,
+                        fetched_at,
+                        time.monotonic() + self.ttl_seconds,
+                        version,
+                    )
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_size:
+                        self._entries.popitem(last=False)
+        return context
+
+    def invalidate(self, tenant_id: str, ticket_id: str):
+        """Drop the cached context and bump the ticket's version."""
+        key = (tenant_id, ticket_id)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._bump_version(key)
+
+    def observe(self, event: dict):
+        """Update the cache from a consumed Kafka event."""
+        payload = event.get("value") or {}
+        tenant_id = payload.get("tenantId")
+        # message.* events carry the message id as aggregate, so prefer ticketId
+        inner = payload.get("payload") or {}
+        ticket_id = inner.get("ticketId") or payload.get("aggregateId")
+        if not tenant_id or not ticket_id:
+            return
+
+        event_type = payload.get("eventType") or event.get("topic")
+        if event_type in NOOP_EVENT_TYPES:
+            return
+
+        key = (tenant_id, ticket_id)
+        patcher = EVENT_PATCHERS.get(event_type)
+        with self._lock:
+            entry = self._entries.get(key)
+            version = self._bump_version(key)
+            if patcher is not None and entry is not None:
+                context, fetched_at, expires_at, _ = entry
+                event_time = published_at(event)
+                if event_time is not None and event_time <= fetched_at:
+                    # Fetched after this event (e.g. a retry): already reflected
+                    self._entries[key] = (context, fetched_at, expires_at, version)
+                    return
+                patched = dict(context)
+                patcher(patched, inner)
+                # The entry now reflects this event, so it passes its versioned read
+                as_of = max(fetched_at, event_time or fetched_at)
+                self._entries[key] = (patched, as_of, expires_at, version)
+                logger.debug(f"Patched cached context for ticket {ticket_id}")
+            else:
+                self._entries.pop(key, None)
+                logger.debug(f"Invalidated cached context for ticket {ticket_id}")
+
+    def clear(self):
+        """Drop every cached context."""
+        with self._lock:
+            for key in self._entries:
+                self._bump_version(key)
+            self._entries.clear()
+
+    def _bump_version(self, key) -> int:
+        version = self._versions.pop(key, 0) + 1
+        self._versions[key] = version
+        while len(self._versions) > self.max_size * 4:
+            self._versions.popitem(last=False)
+        return version
+
+
+def published_at(event: dict) -> Optional[float]:
+    """Parse an event's `publishedAt` timestamp into epoch seconds."""
+    value = (event.get("value") or {}).get("publishedAt")
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
@@ -10,6 +10,9 @@ from .consumer import TicketEventConsumer
 from .mcp_client import MCPClient
 from .triage import TriageBrain
 from .embeddings import EmbeddingService
+from .context_cache import TicketContextCache, published_at
+from .claims import EventClaimer
+from .retry import RetryRouter
 
 # Configure logging (keep for file logs/errors, but use Rich for demo visuals)
 logging.basicConfig(
@@ -24,11 +27,32 @@ load_dotenv()
 KAFKA_BOOTSTRAP_SERVERS = os.getenv("KAFKA_BOOTSTRAP_SERVERS", "localhost:9092")
 MCP_URL = os.getenv("MCP_URL", "http://localhost:3001")
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+TICKET_CONTEXT_CACHE_SIZE = int(os.getenv("TICKET_CONTEXT_CACHE_SIZE", "1024"))
+TICKET_CONTEXT_CACHE_TTL = float(os.getenv("TICKET_CONTEXT_CACHE_TTL", "86400"))
+TICKET_CONTEXT_CLOCK_SKEW = float(os.getenv("TICKET_CONTEXT_CLOCK_SKEW", "5"))
+CLAIM_FILTER_SIZE = int(os.getenv("CLAIM_FILTER_SIZE", "100000"))
+CONSUMER_BATCH_SIZE = int(os.getenv("CONSUMER_BATCH_SIZE", "50"))
+
+# Idempotency consumer name per handled topic
+CONSUMER_NAMES = {
+    "ticket.created": "ai-worker",
+    "ticket.resolved": "ai-worker-memory",
+}
+
+# Topics every replica consumes in full (per-instance group) to keep its
+# ticket context cache fresh, whichever replica owns the partitions
+CACHE_INVALIDATION_TOPICS = ["ticket.triaged", "ticket.assigned", "ticket.resolved"]
 
 # Rich Console
 console = Console()
 
-def handle_ticket_created(event: dict, mcp: MCPClient, triage_brain: TriageBrain):
+def claim_name(event: dict) -> str:
+    """Idempotency consumer name for an event; each retry attempt has its own claim."""
+    name = CONSUMER_NAMES[event["topic"]]
+    attempt = event.get("attempt")
+    return f"{name}:retry{attempt}" if attempt else name
+
+def handle_ticket_created(event: dict, mcp: MCPClient, claimer: EventClaimer, triage_brain: TriageBrain):
     """Handle a ticket.created event."""
     payload = event["value"]
     event_id = payload.get("eventId")
@@ -42,25 +66,25 @@ def handle_ticket_created(event: dict, mcp: MCPClient, triage_brain: TriageBrain
     
     # Step 1: Claim event for idempotency
     try:
-        claim_result = mcp.claim_event(tenant_id, event_id, "ai-worker")
-        if not claim_result.get("claimed", False):
+        if not claimer.claim(tenant_id, event_id, claim_name(event)):
             console.print(f"[yellow]⚠️ Event {event_id} already processed, skipping[/]")
             return
     except Exception as e:
         logger.error(f"Failed to claim event: {e}")
-        return
+        raise
     
     # Step 2: Get ticket context
     try:
         console.print("[dim]🛠️  Calling Tool: get_ticket_context...[/]")
-        ticket = mcp.get_ticket_context(tenant_id, ticket_id)
+        # Versioned read: never triage on a context older than this event
+        ticket = mcp.get_ticket_context(tenant_id, ticket_id, not_before=published_at(event))
         if ticket.get("error"):
             console.print(f"[bold red]❌ Failed to get ticket context: {ticket['error']}[/]")
-            return
+            raise RuntimeError(f"Ticket context error: {ticket['error']}")
         console.print(f"  📄 Ticket Title: [bold]{ticket.get('title', 'unknown')}[/]")
     except Exception as e:
         logger.error(f"Failed to get ticket context: {e}")
-        return
+        raise
     
     # Step 3: AI Triage using TriageBrain with RAG
     try:
@@ -84,15 +108,18 @@ def handle_ticket_created(event: dict, mcp: MCPClient, triage_brain: TriageBrain
                  console.print(f"   [yellow]• Match {i+1} ({score:.1%}):[/] [italic]{content}...[/]")
     except Exception as e:
         logger.error(f"Triage failed: {e}")
-        return
+        raise
     
     # Step 4: Create proposal
     try:
         console.print("\n[dim]🛠️  Calling Tool: create_action_proposals...[/]")
+        # Keyed by event so a retry after a committed-but-timed-out call
+        # doesn't create a second proposal or triage event
         proposal_result = mcp.create_action_proposals(
             tenant_id,
             ticket_id,
             correlation_id,
+            idempotency_key=event_id,
             proposals=[{
                 "action_type": "APPLY_TRIAGE",
                 "confidence": triage_result.confidence,
@@ -105,6 +132,10 @@ def handle_ticket_created(event: dict, mcp: MCPClient, triage_brain: TriageBrain
             }]
         )
         
+        if proposal_result.get("error"):
+            console.print(f"[bold red]❌ Failed to create proposal: {proposal_result['error']}[/]")
+            raise RuntimeError(f"create_action_proposals failed: {proposal_result['error']}")
+        
         proposals = proposal_result.get("proposals", [])
         if proposals:
             proposal = proposals[0]
@@ -117,12 +148,12 @@ def handle_ticket_created(event: dict, mcp: MCPClient, triage_brain: TriageBrain
             
     except Exception as e:
         logger.error(f"Failed to create proposal: {e}")
-        return
+        raise
     
     console.print(f"[dim]✅ Event processing complete[/]\n")
 
 
-def handle_ticket_resolved(event: dict, mcp: MCPClient, embedding_service):
+def handle_ticket_resolved(event: dict, mcp: MCPClient, claimer: EventClaimer, embedding_service):
     """Handle a ticket.resolved event - store resolution as memory."""
     payload = event["value"]
     event_id = payload.get("eventId")
@@ -141,24 +172,23 @@ def handle_ticket_resolved(event: dict, mcp: MCPClient, embedding_service):
     
     # Step 1: Claim event for idempotency
     try:
-        claim_result = mcp.claim_event(tenant_id, event_id, "ai-worker-memory")
-        if not claim_result.get("claimed", False):
+        if not claimer.claim(tenant_id, event_id, claim_name(event)):
             console.print(f"[yellow]⚠️ Event {event_id} already processed, skipping[/]")
             return
     except Exception as e:
         logger.error(f"Failed to claim event: {e}")
-        return
+        raise
     
     # Step 2: Get ticket context for full details
     try:
         console.print("[dim]🛠️  Calling Tool: get_ticket_context...[/]")
-        ticket = mcp.get_ticket_context(tenant_id, ticket_id)
+        ticket = mcp.get_ticket_context(tenant_id, ticket_id, not_before=published_at(event))
         if ticket.get("error"):
             console.print(f"[bold red]❌ Failed to get ticket context: {ticket['error']}[/]")
-            return
+            raise RuntimeError(f"Ticket context error: {ticket['error']}")
     except Exception as e:
         logger.error(f"Failed to get ticket context: {e}")
-        return
+        raise
     
     # Step 3: Build memory content
     title = ticket.get("title", "Unknown")
@@ -183,7 +213,7 @@ Vendor: {vendor_name}"""
         console.print(f"  [dim]Generated embedding: {len(embedding)} dimensions[/]")
     except Exception as e:
         logger.error(f"Failed to generate embedding: {e}")
-        return
+        raise
     
     # Step 5: Store memory
     try:
@@ -206,13 +236,14 @@ Vendor: {vendor_name}"""
             console.print(f"[yellow]  Memory already stored, skipping[/]")
         elif not result.get("success", True) or result.get("error"):
             console.print(f"[bold red]  ❌ FAILED to store memory: {result.get('error', 'Unknown error')}[/]")
+            raise RuntimeError(f"store_memory failed: {result.get('error', 'Unknown error')}")
         else:
             memory_id = result.get('id', 'unknown')
             console.print(Panel(f"[bold gold1]💾 Institutional Memory Updated![/]\nID: {memory_id[:8]}...", border_style="gold1"))
             
     except Exception as e:
         logger.error(f"Failed to store memory: {e}")
-        return
+        raise
     
     console.print(f"[dim]✅ Event processing complete[/]\n")
 
@@ -228,17 +259,33 @@ def main():
     else:
         console.print("  Gemini: [bold red]NOT SET (using heuristics)[/]")
     
-    # Create MCP client
-    mcp = MCPClient(MCP_URL)
+    # Create MCP client with ticket context cache
+    context_cache = TicketContextCache(
+        max_size=TICKET_CONTEXT_CACHE_SIZE,
+        ttl_seconds=TICKET_CONTEXT_CACHE_TTL,
+        clock_skew_seconds=TICKET_CONTEXT_CLOCK_SKEW
+    )
+    mcp = MCPClient(MCP_URL, context_cache=context_cache)
     
     # Check MCP health
     try:
         health = mcp.health_check()
-        console.print(f"  MCP Health: [green]{health}[/]\n")
+        console.print(f"  MCP Health: [green]{health}[/]")
     except Exception as e:
         console.print(f"[bold red]❌ MCP health check failed: {e}[/]")
         return
     
+    # Local dedupe filter in front of claim_event, warmed from processed_events
+    # (CLAIM_FILTER_SIZE event IDs per consumer name)
+    claimer = EventClaimer(mcp, max_size=CLAIM_FILTER_SIZE)
+    for consumer_name in CONSUMER_NAMES.values():
+        try:
+            warmed = claimer.warm(consumer_name, limit=CLAIM_FILTER_SIZE)
+            console.print(f"  Claim filter: [green]{warmed} {consumer_name} events[/]")
+        except Exception as e:
+            logger.warning(f"Failed to warm claim filter for {consumer_name}: {e}")
+    console.print()
+    
     # Create embedding service for RAG
     embedding_service = EmbeddingService(api_key=GOOGLE_API_KEY)
     
@@ -249,25 +296,58 @@ def main():
         embedding_service=embedding_service
     )
     
-    # Create consumer - listen to both ticket.created AND ticket.resolved
+    # Create consumer - listen to both ticket.created AND ticket.resolved,
+    # plus a broadcast of ticket lifecycle events for the context cache
+    # Failed events go to delay topics / DLQ instead of blocking the partition
+    retry_router = RetryRouter(bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS)
     consumer = TicketEventConsumer(
         bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS,
-        topics=["ticket.created", "ticket.resolved"]
+        topics=["ticket.created", "ticket.resolved"],
+        retry_router=retry_router,
+        broadcast_topics=CACHE_INVALIDATION_TOPICS,
+        # A new assignment may replay already-claimed events
+        on_assign=claimer.expect_duplicates
     )
     
     # Start consuming - route to appropriate handler based on topic
     def handler(event: dict):
         topic = event.get("topic", "")
-        if topic == "ticket.created":
-            handle_ticket_created(event, mcp, triage_brain)
-        elif topic == "ticket.resolved":
-            handle_ticket_resolved(event, mcp, embedding_service)
-        else:
-            logger.warning(f"Unknown topic: {topic}")
+        # Also seen on the broadcast; observing here first keeps the handler's
+        # own read a hit. Replays are no-ops for the cache.
+        context_cache.observe(event)
+        if event.get("attempt"):
+            console.print(f"[dim]🔁 Retry attempt {event['attempt']} from {event.get('retry_topic')}[/]")
+        try:
+            if topic == "ticket.created":
+                handle_ticket_created(event, mcp, claimer, triage_brain)
+            elif topic == "ticket.resolved":
+                handle_ticket_resolved(event, mcp, claimer, embedding_service)
+            else:
+                logger.warning(f"Unknown topic: {topic}")
+        except Exception:
+            # Let this worker take over its own claim if the event is re-read
+            # (routing to the retry topic failed and the partition was rewound)
+            claimer.mark_failed(event["value"].get("eventId"), claim_name(event))
+            raise
+    
+    # While replaying, drop known duplicates for each polled batch in one round-trip
+    def batch_handler(events: list[dict]):
+        by_consumer: dict[str, list] = {}
+        for event in events:
+            if event.get("topic") in CONSUMER_NAMES:
+                by_consumer.setdefault(claim_name(event), []).append(event["value"].get("eventId"))
+        for consumer_name, event_ids in by_consumer.items():
+            claimer.prefilter_batch(consumer_name, event_ids)
     
     try:
-        consumer.consume(handler)
+        consumer.consume(
+            handler,
+            batch_handler=batch_handler,
+            batch_size=CONSUMER_BATCH_SIZE,
+            broadcast_handler=context_cache.observe
+        )
     finally:
+        retry_router.close()
         mcp.close()
 
 if __name__ == "__main__":
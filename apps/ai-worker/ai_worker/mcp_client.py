@@ -1,14 +1,21 @@
 """MCP Client for calling MCP server tools."""
 import httpx
 import json
-from typing import Any
+from typing import Any, Optional
+
+from .context_cache import TicketContextCache
 
 class MCPClient:
     """Simple HTTP client for MCP server."""
     
-    def __init__(self, base_url: str = "http://localhost:3001"):
+    def __init__(
+        self,
+        base_url: str = "http://localhost:3001",
+        context_cache: Optional[TicketContextCache] = None
+    ):
         self.base_url = base_url
         self.client = httpx.Client(timeout=30.0)
+        self.context_cache = context_cache
     
     def health_check(self) -> dict:
         """Check MCP server health."""
@@ -35,14 +42,34 @@ class MCPClient:
         )
         if response.status_code == 404:
             raise Exception(f"Tool {tool_name} not found or endpoint not implemented")
+        if response.status_code >= 500:
+            # Server-side failure: raise so the event is retried, not treated as an answer
+            raise Exception(f"Tool {tool_name} failed ({response.status_code}): {response.text}")
         return response.json()
     
-    def get_ticket_context(self, tenant_id: str, ticket_id: str) -> dict:
-        """Get ticket context."""
-        return self.call_tool_sync("get_ticket_context", {
-            "tenant_id": tenant_id,
-            "ticket_id": ticket_id
-        })
+    def get_ticket_context(
+        self,
+        tenant_id: str,
+        ticket_id: str,
+        not_before: Optional[float] = None
+    ) -> dict:
+        """
+        Get ticket context, served from the context cache when configured.
+        
+        Args:
+            tenant_id: Tenant UUID
+            ticket_id: Ticket UUID
+            not_before: Only accept a cached context fetched after this epoch time
+        """
+        def fetch() -> dict:
+            return self.call_tool_sync("get_ticket_context", {
+                "tenant_id": tenant_id,
+                "ticket_id": ticket_id
+            })
+        
+        if self.context_cache is None:
+            return fetch()
+        return self.context_cache.get(tenant_id, ticket_id, fetch, not_before=not_before)
     
     def claim_event(self, tenant_id: str, event_id: str, consumer_name: str) -> dict:
         """Claim an event for idempotent processing."""
@@ -52,19 +79,35 @@ class MCPClient:
             "consumer_name": consumer_name
         })
     
+    def find_processed_events(self, consumer_name: str, event_ids: list) -> dict:
+        """Return which of `event_ids` a consumer has already claimed."""
+        return self.call_tool_sync("find_processed_events", {
+            "consumer_name": consumer_name,
+            "event_ids": event_ids
+        })
+    
+    def list_processed_events(self, consumer_name: str, limit: int = 10000) -> dict:
+        """List the most recently claimed event IDs for a consumer."""
+        return self.call_tool_sync("list_processed_events", {
+            "consumer_name": consumer_name,
+            "limit": limit
+        })
+    
     def create_action_proposals(
         self, 
         tenant_id: str, 
         ticket_id: str, 
         correlation_id: str, 
-        proposals: list
+        proposals: list,
+        idempotency_key: str = None
     ) -> dict:
-        """Create action proposals."""
+        """Create action proposals; calls repeated with the same idempotency key are deduped."""
         return self.call_tool_sync("create_action_proposals", {
             "tenant_id": tenant_id,
             "ticket_id": ticket_id,
             "correlation_id": correlation_id,
-            "proposals": proposals
+            "proposals": proposals,
+            "idempotency_key": idempotency_key
         })
     
     def store_memory(
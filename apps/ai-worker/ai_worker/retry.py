@@ -0,0 +1,117 @@
+"""Non-blocking retries: tiered delay topics with a final dead-letter topic."""
+import json
+import logging
+import time
+from typing import Optional
+
+from confluent_kafka import Producer
+
+logger = logging.getLogger(__name__)
+
+# (topic, delay in seconds) - attempt N goes to tier N
+DEFAULT_RETRY_TIERS = [
+    ("ticket.retry.10s", 10),
+    ("ticket.retry.1m", 60),
+    ("ticket.retry.10m", 600),
+]
+DEFAULT_DEAD_LETTER_TOPIC = "ticket.dlq"
+
+
+class RetryRouter:
+    """Republishes failed events to delay topics instead of retrying inline.
+
+    Retry messages wrap the original event value in an envelope carrying the
+    original topic, attempt number and due time. The consumer holds a retry
+    partition until its head message is due; since every message in a tier
+    has the same delay, the partition is ordered by due time. Once all tiers
+    are exhausted the event lands on the dead-letter topic.
+    """
+
+    def __init__(
+        self,
+        bootstrap_servers: str = "localhost:9092",
+        tiers: Optional[list[tuple[str, float]]] = None,
+        dead_letter_topic: str = DEFAULT_DEAD_LETTER_TOPIC,
+        flush_timeout: float = 10.0
+    ):
+        self.tiers = tiers or DEFAULT_RETRY_TIERS
+        self.dead_letter_topic = dead_letter_topic
+        self.flush_timeout = flush_timeout
+        self.producer = Producer({
+            "bootstrap.servers": bootstrap_servers,
+            "enable.idempotence": True,
+        })
+
+    @property
+    def retry_topics(self) -> list[str]:
+        """Delay topics the consumer must subscribe to."""
+        return [topic for topic, _ in self.tiers]
+
+    def is_retry_topic(self, topic: str) -> bool:
+        return topic in self.retry_topics
+
+    def unwrap(self, event: dict) -> dict:
+        """Turn a retry-topic event back into the original event."""
+        envelope = event["value"]
+        return {
+            **event,
+            "topic": envelope["originalTopic"],
+            "value": envelope["event"],
+            "attempt": envelope.get("attempt", 1),
+            "due_at": envelope.get("dueAt", 0),
+            "retry_topic": event["topic"],
+        }
+
+    def route(self, event: dict, error: Exception) -> str:
+        """
+        Publish a failed event to its next retry tier or the dead-letter topic.
+
+        Args:
+            event: The (unwrapped) event that failed
+            error: The exception raised by the handler
+
+        Returns:
+            The topic the event was published to
+        """
+        attempt = event.get("attempt", 0)
+        if attempt < len(self.tiers):
+            topic, delay = self.tiers[attempt]
+        else:
+            topic, delay = self.dead_letter_topic, 0
+
+        now = time.time()
+        envelope = {
+            "originalTopic": event["topic"],
+            "attempt": attempt + 1,
+            "dueAt": now + delay,
+            "failedAt": now,
+            "lastError": str(error),
+            "event": event["value"],
+        }
+
+        delivery_errors = []
+
+        def on_delivery(err, msg):
+            if err is not None:
+                delivery_errors.append(err)
+
+        self.producer.produce(
+            topic,
+            key=event.get("key"),
+            value=json.dumps(envelope).encode("utf-8"),
+            on_delivery=on_delivery,
+        )
+        # Block until acknowledged: the source offset is only stored afterwards
+        remaining = self.producer.flush(self.flush_timeout)
+        if remaining or delivery_errors:
+            raise RuntimeError(f"Failed to publish to {topic}: {delivery_errors or 'flush timed out'}")
+
+        if topic == self.dead_letter_topic:
+            logger.error(f"Event dead-lettered after {attempt} retries: {error}")
+        else:
+            logger.warning(f"Event scheduled for retry {attempt + 1} on {topic} in {delay}s: {error}")
+        return topic
+
+    def close(self):
+        """Flush any in-flight messages."""
+        self.producer.flush(self.flush_timeout)
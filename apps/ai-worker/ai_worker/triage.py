@@ -116,6 +116,7 @@ class TriageBrain:
                 similar.append({
                     "content": r.get("content", ""),
                     "similarity": r.get("similarity", 0),
+                    "occurrences": r.get("occurrenceCount", 1),
                     "metadata": r.get("metadata", {})
                 })
         
@@ -128,7 +129,7 @@ class TriageBrain:
         similar_section = ""
         if similar_tickets:
             incidents = "\n".join([
-                f"- [Similarity: {t['similarity']:.0%}] {t['content'][:200]}..."
+                f"- [Similarity: {t['similarity']:.0%}, seen {t.get('occurrences', 1)}x] {t['content'][:200]}..."
                 for t in similar_tickets
             ])
             similar_section = SIMILAR_SECTION_TEMPLATE.format(incidents=incidents)
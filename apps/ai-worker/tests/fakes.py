@@ -0,0 +1,69 @@
+"""Fake Kafka consumer/messages for consumer loop tests."""
+import json
+
+
+class FakeError:
+    def __init__(self, code):
+        self._code = code
+
+    def code(self):
+        return self._code
+
+
+class FakeMessage:
+    def __init__(self, topic, partition, offset, value, key=b"ticket-1", raw=None, error=None):
+        self._error = error
+        self._topic = topic
+        self._partition = partition
+        self._offset = offset
+        self._key = key
+        self._raw = raw if raw is not None or value is None else json.dumps(value).encode("utf-8")
+
+    def error(self):
+        return self._error
+
+    def topic(self):
+        return self._topic
+
+    def partition(self):
+        return self._partition
+
+    def offset(self):
+        return self._offset
+
+    def key(self):
+        return self._key
+
+    def value(self):
+        return self._raw
+
+
+class FakeKafkaConsumer:
+    """Replays scripted batches, then stops the loop."""
+
+    def __init__(self, batches):
+        self.batches = list(batches)
+        self.stored = []
+        self.paused = []
+        self.seeks = []
+        self.resumed = []
+
+    def consume(self, num_messages=1, timeout=1.0):
+        if not self.batches:
+            raise KeyboardInterrupt
+        return self.batches.pop(0)
+
+    def store_offsets(self, message):
+        self.stored.append((message.topic(), message.offset()))
+
+    def pause(self, partitions):
+        self.paused.extend((tp.topic, tp.partition, tp.offset) for tp in partitions)
+
+    def seek(self, partition):
+        self.seeks.append((partition.topic, partition.offset))
+
+    def resume(self, partitions):
+        self.resumed.extend((tp.topic, tp.partition) for tp in partitions)
+
+    def close(self):
+        pass
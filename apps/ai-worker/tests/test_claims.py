@@ -0,0 +1,168 @@
+"""Tests for the local claim dedupe filter."""
+import pytest
+
+from ai_worker.claims import EventClaimer
+
+TENANT = "tenant-1"
+
+
+class FakeMCP:
+    """In-memory stand-in for the processed_events MCP tools."""
+
+    def __init__(self, processed=None):
+        # (consumer_name, event_id) pairs, oldest first
+        self.processed = list(processed or [])
+        self.claim_calls = 0
+        self.find_calls = 0
+
+    def claim_event(self, tenant_id, event_id, consumer_name):
+        self.claim_calls += 1
+        key = (consumer_name, event_id)
+        if key in self.processed:
+            return {"claimed": False}
+        self.processed.append(key)
+        return {"claimed": True}
+
+    def find_processed_events(self, consumer_name, event_ids):
+        self.find_calls += 1
+        return {"event_ids": [e for c, e in self.processed if c == consumer_name and e in event_ids]}
+
+    def list_processed_events(self, consumer_name, limit=10000):
+        ids = [e for c, e in self.processed if c == consumer_name]
+        return {"event_ids": list(reversed(ids))[:limit]}
+
+
+def test_duplicate_claim_short_circuits_locally():
+    mcp = FakeMCP()
+    claimer = EventClaimer(mcp)
+
+    assert claimer.claim(TENANT, "e1", "ai-worker") is True
+    assert claimer.claim(TENANT, "e1", "ai-worker") is False
+
+    assert mcp.claim_calls == 1
+    assert claimer.local_hits == 1
+
+
+def test_prefilter_skips_known_duplicates_without_claiming():
+    mcp = FakeMCP(processed=[("ai-worker", "e1")])
+    claimer = EventClaimer(mcp)
+
+    claimer.prefilter_batch("ai-worker", ["e1", "e2", "e3"])
+
+    # Nothing new was written by the batch lookup
+    assert mcp.processed == [("ai-worker", "e1")]
+    assert claimer.claim(TENANT, "e1", "ai-worker") is False
+    assert claimer.claim(TENANT, "e2", "ai-worker") is True
+    assert mcp.claim_calls == 1
+
+
+def test_crash_mid_batch_does_not_strand_events():
+    mcp = FakeMCP()
+    worker_a = EventClaimer(mcp)
+    worker_a.prefilter_batch("ai-worker", ["e1", "e2", "e3"])
+    assert worker_a.claim(TENANT, "e1", "ai-worker") is True
+    # Worker A dies here; the partition is re-read by worker B
+
+    worker_b = EventClaimer(mcp)
+    worker_b.prefilter_batch("ai-worker", ["e1", "e2", "e3"])
+
+    assert worker_b.claim(TENANT, "e1", "ai-worker") is False
+    assert worker_b.claim(TENANT, "e2", "ai-worker") is True
+    assert worker_b.claim(TENANT, "e3", "ai-worker") is True
+
+
+def test_prefilter_failure_falls_back_to_per_event_claims():
+    class FailingMCP(FakeMCP):
+        def find_processed_events(self, consumer_name, event_ids):
+            raise ConnectionError("MCP down")
+
+    claimer = EventClaimer(FailingMCP())
+    claimer.prefilter_batch("ai-worker", ["e1"])
+
+    assert claimer.claim(TENANT, "e1", "ai-worker") is True
+
+
+def test_warm_keeps_each_consumer_within_its_own_capacity():
+    processed = [("ai-worker", f"c{i}") for i in range(3)] + [("ai-worker-memory", f"r{i}") for i in range(3)]
+    mcp = FakeMCP(processed=processed)
+    claimer = EventClaimer(mcp, max_size=3)
+
+    assert claimer.warm("ai-worker") == 3
+    assert claimer.warm("ai-worker-memory") == 3
+
+    for i in range(3):
+        assert claimer.claim(TENANT, f"c{i}", "ai-worker") is False
+        assert claimer.claim(TENANT, f"r{i}", "ai-worker-memory") is False
+    assert mcp.claim_calls == 0
+
+
+def test_filter_is_bounded():
+    claimer = EventClaimer(FakeMCP(), max_size=2)
+    for event_id in ("e1", "e2", "e3"):
+        claimer.claim(TENANT, event_id, "ai-worker")
+
+    assert list(claimer._seen["ai-worker"]) == ["e2", "e3"]
+
+
+def test_retry_attempt_claims_independently_of_original():
+    mcp = FakeMCP()
+    claimer = EventClaimer(mcp)
+
+    assert claimer.claim(TENANT, "e1", "ai-worker") is True
+    # Handler failed and the event was routed; the retry uses its own claim
+    assert claimer.claim(TENANT, "e1", "ai-worker:retry1") is True
+    assert claimer.claim(TENANT, "e1", "ai-worker:retry1") is False
+
+
+def test_failed_event_can_be_taken_over_when_re_read():
+    mcp = FakeMCP()
+    claimer = EventClaimer(mcp)
+    claimer.claim(TENANT, "e1", "ai-worker")
+
+    # Routing to the retry topic failed, so the source partition is rewound
+    claimer.mark_failed("e1", "ai-worker")
+    claimer.prefilter_batch("ai-worker", ["e1"])
+
+    assert claimer.claim(TENANT, "e1", "ai-worker") is True
+    assert claimer.claim(TENANT, "e1", "ai-worker") is False
+
+
+def test_claim_error_raises_and_is_not_remembered():
+    class BrokenMCP(FakeMCP):
+        def claim_event(self, tenant_id, event_id, consumer_name):
+            self.claim_calls += 1
+            return {"error": "Can't reach database server"}
+
+    mcp = BrokenMCP()
+    claimer = EventClaimer(mcp)
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            claimer.claim(TENANT, "e1", "ai-worker")
+
+    assert mcp.claim_calls == 2
+    assert claimer.local_hits == 0
+
+
+def test_prefilter_is_skipped_once_caught_up():
+    mcp = FakeMCP()
+    claimer = EventClaimer(mcp)
+
+    claimer.prefilter_batch("ai-worker", ["e1"])
+    claimer.prefilter_batch("ai-worker", ["e2"])
+
+    assert mcp.find_calls == 1
+
+
+def test_duplicate_or_rebalance_resumes_prefiltering():
+    mcp = FakeMCP(processed=[("ai-worker", "e1")])
+    claimer = EventClaimer(mcp)
+    claimer.prefilter_batch("ai-worker", ["e2"])
+
+    # A replayed event shows up again
+    assert claimer.claim(TENANT, "e1", "ai-worker") is False
+    claimer.prefilter_batch("ai-worker", ["e3"])
+    claimer.expect_duplicates()
+    claimer.prefilter_batch("ai-worker", ["e4"])
+
+    assert mcp.find_calls == 3
@@ -0,0 +1,78 @@
+"""Tests for the Kafka consumer loop."""
+import pytest
+
+pytest.importorskip("confluent_kafka")
+
+from confluent_kafka import KafkaError
+
+from ai_worker.consumer import TicketEventConsumer
+
+from fakes import FakeError, FakeKafkaConsumer, FakeMessage
+
+
+def run(consumer, batches, handler, **kwargs):
+    fake = FakeKafkaConsumer(batches)
+    consumer.consumer = fake
+    consumer.consume(handler, **kwargs)
+    return fake
+
+
+@pytest.mark.parametrize("raw", [None, b"\xff\xfe", b"not json"])
+def test_unparseable_message_is_skipped_and_committed(raw):
+    handled = []
+    bad = FakeMessage("ticket.created", 0, 1, None, raw=raw)
+    good = FakeMessage("ticket.created", 0, 2, {"eventId": "e2"})
+
+    fake = run(TicketEventConsumer(), [[bad, good]], handled.append)
+
+    assert [e["value"]["eventId"] for e in handled] == ["e2"]
+    assert fake.stored == [("ticket.created", 1), ("ticket.created", 2)]
+
+
+def test_batch_handler_sees_whole_batch_before_handler():
+    calls = []
+    msgs = [FakeMessage("ticket.created", 0, i, {"eventId": f"e{i}"}) for i in range(3)]
+
+    run(
+        TicketEventConsumer(),
+        [msgs],
+        lambda e: calls.append(("handle", e["value"]["eventId"])),
+        batch_handler=lambda events: calls.append(("batch", len(events))),
+        batch_size=3,
+    )
+
+    assert calls == [("batch", 3), ("handle", "e0"), ("handle", "e1"), ("handle", "e2")]
+
+
+def test_unknown_topic_error_is_not_fatal():
+    handled = []
+    missing = FakeMessage("ticket.triaged", 0, -1, None, error=FakeError(KafkaError.UNKNOWN_TOPIC_OR_PART))
+    good = FakeMessage("ticket.created", 0, 1, {"eventId": "e1"})
+
+    run(TicketEventConsumer(), [[missing], [good]], handled.append)
+
+    assert [e["value"]["eventId"] for e in handled] == ["e1"]
+
+
+def test_broadcast_topics_bypass_the_handler():
+    handled, observed = [], []
+    consumer = TicketEventConsumer(topics=["ticket.created"], broadcast_topics=["ticket.triaged"])
+    consumer.broadcast_consumer = FakeKafkaConsumer([[FakeMessage("ticket.triaged", 0, 7, {"eventId": "t1"})]])
+
+    run(
+        consumer,
+        [[FakeMessage("ticket.created", 0, 1, {"eventId": "e1"})]],
+        lambda e: handled.append(e["value"]["eventId"]),
+        broadcast_handler=lambda e: observed.append(e["value"]["eventId"]),
+    )
+
+    assert handled == ["e1"]
+    assert observed == ["t1"]
+
+
+def test_each_instance_gets_its_own_broadcast_group():
+    a = TicketEventConsumer(broadcast_topics=["ticket.triaged"])
+    b = TicketEventConsumer(broadcast_topics=["ticket.triaged"])
+
+    assert a.config["group.id"] == b.config["group.id"] == "ai-worker"
+    assert a.broadcast_config["group.id"] != b.broadcast_config["group.id"]
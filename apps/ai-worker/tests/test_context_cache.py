@@ -0,0 +1,158 @@
+"""Tests for the ticket context cache."""
+import time
+from datetime import datetime, timezone
+
+from ai_worker.context_cache import TicketContextCache, published_at
+
+TENANT = "tenant-1"
+TICKET = "ticket-1"
+
+
+class FakeFetch:
+    """Stands in for the get_ticket_context MCP call."""
+
+    def __init__(self, context=None):
+        self.calls = 0
+        self.context = context or {"id": TICKET, "title": "Boiler broken", "status": "NEW"}
+
+    def __call__(self):
+        self.calls += 1
+        return dict(self.context)
+
+
+def make_event(event_type, published="2026-01-01T00:00:00.000Z", **payload):
+    return {
+        "topic": event_type,
+        "value": {
+            "eventId": f"{event_type}-event",
+            "tenantId": TENANT,
+            "aggregateId": TICKET,
+            "eventType": event_type,
+            "publishedAt": published,
+            "payload": {"ticketId": TICKET, **payload},
+        },
+    }
+
+
+def test_second_read_is_a_hit():
+    cache = TicketContextCache()
+    fetch = FakeFetch()
+
+    cache.get(TENANT, TICKET, fetch)
+    cache.get(TENANT, TICKET, fetch)
+
+    assert fetch.calls == 1
+    assert cache.hits == 1
+
+
+def test_ticket_lifecycle_serves_resolved_handler_from_cache():
+    cache = TicketContextCache()
+    fetch = FakeFetch()
+
+    created = make_event("ticket.created", "2026-01-01T00:00:00.000Z")
+    cache.observe(created)
+    cache.get(TENANT, TICKET, fetch, not_before=published_at(created))
+
+    # Later lifecycle events are published after the context was fetched
+    cache.observe(make_event("ticket.triaged", "2100-01-01T00:01:00.000Z", newStatus="TRIAGED", newPriority=4))
+    cache.observe(make_event("ticket.assigned", "2100-01-01T00:02:00.000Z", vendorName="Acme"))
+    resolved = make_event("ticket.resolved", "2100-01-01T00:03:00.000Z", resolutionNotes="Replaced valve")
+    cache.observe(resolved)
+    ticket = cache.get(TENANT, TICKET, fetch, not_before=published_at(resolved))
+
+    assert fetch.calls == 1
+    assert cache.hits == 1
+    assert ticket["status"] == "RESOLVED"
+    assert ticket["priority"] == 4
+    assert ticket["resolutionNotes"] == "Replaced valve"
+
+
+def test_retried_event_does_not_rewind_patched_context():
+    cache = TicketContextCache()
+    cache.get(TENANT, TICKET, FakeFetch())
+    cache.observe(make_event("ticket.triaged", "2100-01-01T00:00:00.000Z", newPriority=4))
+    cache.observe(make_event("ticket.resolved", "2100-01-01T00:05:00.000Z", resolutionNotes="Fixed"))
+
+    # Replay of the older triage event from a retry
+    cache.observe(make_event("ticket.triaged", "2100-01-01T00:00:00.000Z", newPriority=4))
+
+    assert cache.get(TENANT, TICKET, FakeFetch())["status"] == "RESOLVED"
+
+
+def test_unknown_event_invalidates():
+    cache = TicketContextCache()
+    fetch = FakeFetch()
+    cache.get(TENANT, TICKET, fetch)
+
+    cache.observe(make_event("message.created"))
+    cache.get(TENANT, TICKET, fetch)
+
+    assert fetch.calls == 2
+
+
+def test_versioned_read_refetches_context_older_than_event():
+    cache = TicketContextCache()
+    fetch = FakeFetch()
+    cache.get(TENANT, TICKET, fetch)
+
+    cache.get(TENANT, TICKET, fetch, not_before=published_at(make_event("ticket.created", "2100-01-01T00:00:00Z")))
+
+    assert fetch.calls == 2
+
+
+def test_fetch_racing_an_event_is_not_cached():
+    cache = TicketContextCache()
+
+    def racing_fetch():
+        # An event for the ticket lands while the MCP call is in flight
+        cache.observe(make_event("message.created"))
+        return {"id": TICKET, "status": "NEW"}
+
+    cache.get(TENANT, TICKET, racing_fetch)
+    fetch = FakeFetch()
+    cache.get(TENANT, TICKET, fetch)
+
+    assert fetch.calls == 1
+
+
+def test_errors_are_not_cached():
+    cache = TicketContextCache()
+    fetch = FakeFetch({"error": "Ticket not found"})
+
+    cache.get(TENANT, TICKET, fetch)
+    cache.get(TENANT, TICKET, fetch)
+
+    assert fetch.calls == 2
+
+
+def test_lru_eviction_bounds_size():
+    cache = TicketContextCache(max_size=2)
+    for ticket_id in ("a", "b", "c"):
+        cache.get(TENANT, ticket_id, FakeFetch())
+
+    fetch = FakeFetch()
+    cache.get(TENANT, "a", fetch)
+
+    assert fetch.calls == 1
+    assert len(cache._entries) == 2
+
+
+def test_expired_entry_is_refetched():
+    cache = TicketContextCache(ttl_seconds=0)
+    fetch = FakeFetch()
+
+    cache.get(TENANT, TICKET, fetch)
+    cache.get(TENANT, TICKET, fetch)
+
+    assert fetch.calls == 2
+
+
+def test_event_published_within_clock_skew_of_fetch_still_patches():
+    cache = TicketContextCache(clock_skew_seconds=5)
+    cache.get(TENANT, TICKET, FakeFetch())
+
+    # Published after the fetch, but the API clock runs a second behind ours
+    published = datetime.fromtimestamp(time.time() - 1, timezone.utc).isoformat()
+    cache.observe(make_event("ticket.triaged", published, newPriority=4))
+
+    assert cache.get(TENANT, TICKET, FakeFetch())["status"] == "TRIAGED"
@@ -0,0 +1,210 @@
+"""Tests for retry routing and retry-topic scheduling."""
+import json
+import time
+
+import pytest
+
+pytest.importorskip("confluent_kafka")
+
+from ai_worker.consumer import TicketEventConsumer
+from ai_worker.retry import DEFAULT_DEAD_LETTER_TOPIC, DEFAULT_RETRY_TIERS, RetryRouter
+
+from fakes import FakeKafkaConsumer, FakeMessage
+
+
+class FakeProducer:
+    """Acknowledges every produce immediately unless told to fail."""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.produced = []
+        self._callbacks = []
+
+    def produce(self, topic, key=None, value=None, on_delivery=None):
+        self.produced.append((topic, key, json.loads(value)))
+        self._callbacks.append(on_delivery)
+
+    def flush(self, timeout=None):
+        for callback in self._callbacks:
+            callback("broker down" if self.fail else None, None)
+        self._callbacks = []
+        return 0
+
+
+def make_router(fail=False):
+    router = RetryRouter()
+    router.producer = FakeProducer(fail=fail)
+    return router
+
+
+def source_event(event_id="e1"):
+    return {
+        "topic": "ticket.created",
+        "partition": 0,
+        "offset": 1,
+        "key": "ticket-1",
+        "value": {"eventId": event_id, "tenantId": "tenant-1"},
+    }
+
+
+def test_failures_walk_the_tiers_then_dead_letter():
+    router = make_router()
+    event = source_event()
+
+    topics = []
+    for _ in range(len(DEFAULT_RETRY_TIERS) + 1):
+        topics.append(router.route(event, ValueError("boom")))
+        # What the consumer would hand back on the next attempt
+        _, _, envelope = router.producer.produced[-1]
+        event = router.unwrap({**source_event(), "topic": topics[-1], "value": envelope})
+
+    assert topics == [t for t, _ in DEFAULT_RETRY_TIERS] + [DEFAULT_DEAD_LETTER_TOPIC]
+    assert event["topic"] == "ticket.created"
+    assert event["value"] == {"eventId": "e1", "tenantId": "tenant-1"}
+    assert event["attempt"] == len(DEFAULT_RETRY_TIERS) + 1
+
+
+def test_envelope_carries_due_time_and_error():
+    router = make_router()
+    before = time.time()
+
+    router.route(source_event(), ValueError("Gemini 503"))
+
+    topic, key, envelope = router.producer.produced[0]
+    assert topic == "ticket.retry.10s"
+    assert key == "ticket-1"
+    assert envelope["originalTopic"] == "ticket.created"
+    assert envelope["lastError"] == "Gemini 503"
+    assert envelope["dueAt"] >= before + 10
+
+
+def test_route_raises_when_delivery_fails():
+    router = make_router(fail=True)
+
+    with pytest.raises(RuntimeError):
+        router.route(source_event(), ValueError("boom"))
+
+
+def run(router, batches, handler):
+    consumer = TicketEventConsumer(retry_router=router)
+    fake = FakeKafkaConsumer(batches)
+    consumer.consumer = fake
+    consumer.consume(handler)
+    return consumer, fake
+
+
+def retry_message(offset, event_id, due_at):
+    envelope = {
+        "originalTopic": "ticket.created",
+        "attempt": 1,
+        "dueAt": due_at,
+        "event": {"eventId": event_id},
+    }
+    return FakeMessage("ticket.retry.10s", 0, offset, envelope)
+
+
+def test_failed_event_is_routed_without_blocking_partition():
+    router = make_router()
+    handled = []
+
+    def handler(event):
+        handled.append(event["value"]["eventId"])
+        if event["value"]["eventId"] == "bad":
+            raise ValueError("poisoned")
+
+    msgs = [
+        FakeMessage("ticket.created", 0, 1, {"eventId": "bad"}),
+        FakeMessage("ticket.created", 0, 2, {"eventId": "good"}),
+    ]
+    _, fake = run(router, [msgs], handler)
+
+    assert handled == ["bad", "good"]
+    assert [t for t, _, _ in router.producer.produced] == ["ticket.retry.10s"]
+    assert fake.stored == [("ticket.created", 1), ("ticket.created", 2)]
+
+
+def test_retry_partition_is_held_until_due():
+    router = make_router()
+    handled = []
+    now = time.time()
+    msgs = [
+        retry_message(5, "due", now - 1),
+        retry_message(6, "later", now + 100),
+        retry_message(7, "after-later", now - 1),
+    ]
+
+    consumer, fake = run(router, [msgs], lambda e: handled.append(e["value"]["eventId"]))
+
+    # Everything before the not-yet-due message is handled and committed;
+    # the partition is rewound to it and nothing behind it is touched
+    assert handled == ["due"]
+    assert fake.stored == [("ticket.retry.10s", 5)]
+    assert fake.paused == [("ticket.retry.10s", 0, 6)]
+    assert fake.seeks == [("ticket.retry.10s", 6)]
+
+
+def test_held_partition_resumes_once_due():
+    router = make_router()
+    consumer = TicketEventConsumer(retry_router=router)
+    fake = FakeKafkaConsumer([])
+    consumer.consumer = fake
+    consumer._paused = {("ticket.retry.10s", 0): time.time() - 1, ("ticket.retry.1m", 0): time.time() + 60}
+
+    consumer._resume_due_partitions()
+
+    assert fake.resumed == [("ticket.retry.10s", 0)]
+    assert list(consumer._paused) == [("ticket.retry.1m", 0)]
+
+
+def test_routing_failure_rewinds_instead_of_committing():
+    router = make_router(fail=True)
+    handled = []
+
+    def handler(event):
+        handled.append(event["value"]["eventId"])
+        raise ValueError("boom")
+
+    msgs = [
+        FakeMessage("ticket.created", 0, 1, {"eventId": "e1"}),
+        FakeMessage("ticket.created", 0, 2, {"eventId": "e2"}),
+    ]
+    _, fake = run(router, [msgs], handler)
+
+    assert handled == ["e1"]
+    assert fake.stored == []
+    assert fake.seeks == [("ticket.created", 1)]
+
+
+class FakeTriageBrain:
+    def triage(self, ticket, tenant_id=None):
+        from ai_worker.triage import TriageResult
+        return TriageResult(category="routine", priority=3, confidence=0.9, reasoning="Dripping tap")
+
+
+@pytest.mark.parametrize("failing_tool", ["claim_event", "create_action_proposals"])
+def test_mcp_server_error_routes_event_to_retry_topic(failing_tool):
+    main = pytest.importorskip("ai_worker.main")
+    httpx = pytest.importorskip("httpx")
+    from ai_worker.claims import EventClaimer
+    from ai_worker.mcp_client import MCPClient
+
+    def respond(request):
+        tool = request.url.path.rsplit("/", 1)[-1]
+        if tool == failing_tool:
+            return httpx.Response(500, json={"error": "Can't reach database server"})
+        if tool == "claim_event":
+            return httpx.Response(200, json={"claimed": True})
+        if tool == "get_ticket_context":
+            return httpx.Response(200, json={"id": "ticket-1", "title": "Dripping tap"})
+        return httpx.Response(200, json={"proposals": [{"id": "p1"}]})
+
+    mcp = MCPClient("http://mcp.test")
+    mcp.client = httpx.Client(transport=httpx.MockTransport(respond))
+    claimer = EventClaimer(mcp)
+    router = make_router()
+
+    msg = FakeMessage("ticket.created", 0, 1, {"eventId": "e1", "tenantId": "tenant-1", "aggregateId": "ticket-1"})
+    _, fake = run(router, [[msg]], lambda e: main.handle_ticket_created(e, mcp, claimer, FakeTriageBrain()))
+
+    assert [t for t, _, _ in router.producer.produced] == ["ticket.retry.10s"]
+    assert fake.stored == [("ticket.created", 1)]
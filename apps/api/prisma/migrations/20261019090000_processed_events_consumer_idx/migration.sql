@@ -0,0 +1,2 @@
+-- CreateIndex
+CREATE INDEX "processed_events_consumer_name_claimed_at_idx" ON "processed_events"("consumer_name", "claimed_at");
@@ -0,0 +1,10 @@
+-- AlterTable
+ALTER TABLE "memory_documents" ADD COLUMN "occurrence_count" INTEGER NOT NULL DEFAULT 1,
+ADD COLUMN "last_seen_at" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+ADD COLUMN "compacted_at" TIMESTAMP(3);
+
+-- Backfill: existing memories were last seen when they were stored
+UPDATE "memory_documents" SET "last_seen_at" = "created_at";
+
+-- CreateIndex
+CREATE INDEX "memory_documents_tenant_id_compacted_at_idx" ON "memory_documents"("tenant_id", "compacted_at");
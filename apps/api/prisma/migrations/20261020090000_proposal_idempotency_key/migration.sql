@@ -0,0 +1,5 @@
+-- AlterTable
+ALTER TABLE "ai_action_proposals" ADD COLUMN "idempotency_key" TEXT;
+
+-- CreateIndex
+CREATE UNIQUE INDEX "ai_action_proposals_tenant_id_idempotency_key_key" ON "ai_action_proposals"("tenant_id", "idempotency_key");
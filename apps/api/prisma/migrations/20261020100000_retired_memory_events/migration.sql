@@ -0,0 +1,20 @@
+-- CreateTable
+CREATE TABLE "retired_memory_events" (
+    "tenant_id" UUID NOT NULL,
+    "source_event_id" UUID NOT NULL,
+    "reason" TEXT NOT NULL,
+    "retired_at" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT "retired_memory_events_pkey" PRIMARY KEY ("tenant_id","source_event_id")
+);
+
+-- Backfill: events already folded into a representative
+INSERT INTO "retired_memory_events" ("tenant_id", "source_event_id", "reason")
+SELECT m."tenant_id", e.value::uuid, 'MERGED'
+FROM "memory_documents" m
+CROSS JOIN LATERAL jsonb_array_elements_text(
+    CASE WHEN jsonb_typeof(m."metadata"->'mergedSourceEventIds') = 'array'
+         THEN m."metadata"->'mergedSourceEventIds'
+         ELSE '[]'::jsonb END
+) AS e(value)
+ON CONFLICT DO NOTHING;
@@ -1,9 +1,13 @@
-import { Controller, Get, Query } from '@nestjs/common';
+import { Controller, Get, Post, Query, HttpCode, HttpStatus } from '@nestjs/common';
 import { MemoriesService } from './memories.service';
+import { MemoryCompactionService } from './memory-compaction.service';
 
 @Controller('memories')
 export class MemoriesController {
-    constructor(private readonly memoriesService: MemoriesService) { }
+    constructor(
+        private readonly memoriesService: MemoriesService,
+        private readonly compactionService: MemoryCompactionService,
+    ) { }
 
     @Get()
     async findAll(
@@ -18,4 +22,10 @@ export class MemoriesController {
         const count = await this.memoriesService.count(tenantId);
         return { count };
     }
+
+    @Post('compact')
+    @HttpCode(HttpStatus.OK)
+    async compact(@Query('tenantId') tenantId: string) {
+        return this.compactionService.compactTenant(tenantId);
+    }
 }
@@ -1,10 +1,11 @@
 import { Module } from '@nestjs/common';
 import { MemoriesController } from './memories.controller';
 import { MemoriesService } from './memories.service';
+import { MemoryCompactionService } from './memory-compaction.service';
 import { PrismaService } from '../prisma.service';
 
 @Module({
     controllers: [MemoriesController],
-    providers: [MemoriesService, PrismaService],
+    providers: [MemoriesService, MemoryCompactionService, PrismaService],
 })
 export class MemoriesModule { }
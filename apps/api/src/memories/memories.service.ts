@@ -13,6 +13,8 @@ export class MemoriesService {
             select: {
                 id: true,
                 content: true,
+                occurrenceCount: true,
+                lastSeenAt: true,
                 createdAt: true,
             },
         });
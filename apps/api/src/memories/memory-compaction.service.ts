@@ -0,0 +1,211 @@
+import { Injectable, Logger } from '@nestjs/common';
+import { Interval } from '@nestjs/schedule';
+import { PrismaService } from '../prisma.service';
+
+// Cosine similarity at or above which two memories are the same recurring issue
+const SIMILARITY_THRESHOLD = parseFloat(process.env.MEMORY_COMPACTION_SIMILARITY || '0.95');
+// Memories are dropped after this many days without recurring (merges refresh last_seen_at)
+const RETENTION_DAYS = parseInt(process.env.MEMORY_RETENTION_DAYS || '365');
+// Hard cap on memories kept per tenant (least recently seen evicted first)
+const MAX_PER_TENANT = parseInt(process.env.MEMORY_MAX_PER_TENANT || '5000');
+// New memories compacted per tenant per run
+const BATCH_SIZE = parseInt(process.env.MEMORY_COMPACTION_BATCH || '200');
+// Most recent merged source event IDs kept on a representative (for display;
+// retired_memory_events is the authoritative record for store_memory dedupe)
+const MAX_MERGED_IDS = 50;
+
+export interface CompactionResult {
+    tenantId: string;
+    merged: number;
+    kept: number;
+    expired: number;
+    evicted: number;
+}
+
+@Injectable()
+export class MemoryCompactionService {
+    private readonly logger = new Logger(MemoryCompactionService.name);
+    private isProcessing = false;
+
+    constructor(private prisma: PrismaService) { }
+
+    @Interval(60000) // Run every minute
+    async compactPending() {
+        if (this.isProcessing) return;
+        this.isProcessing = true;
+
+        try {
+            const tenants = await this.prisma.$queryRaw<Array<{ tenant_id: string }>>`
+        SELECT DISTINCT tenant_id FROM memory_documents
+      `;
+
+            for (const { tenant_id } of tenants) {
+                const result = await this.compactTenant(tenant_id);
+                if (result.merged || result.expired || result.evicted) {
+                    this.logger.log(
+                        `Compacted memories for ${tenant_id}: merged=${result.merged} kept=${result.kept} ` +
+                        `expired=${result.expired} evicted=${result.evicted}`,
+                    );
+                }
+            }
+        } catch (error) {
+            this.logger.error('Memory compaction error', error);
+        } finally {
+            this.isProcessing = false;
+        }
+    }
+
+    /**
+     * Incrementally compact one tenant's memories.
+     *
+     * Each new (uncompacted) memory is matched against the tenant's existing
+     * representatives by cosine distance. A near-duplicate is folded into its
+     * representative: the embedding becomes the occurrence-weighted mean of
+     * the cluster (a stable anchor), while content and metadata follow the
+     * newest resolution. Otherwise the memory becomes a new representative.
+     * Retention then bounds the tenant's index size.
+     *
+     * Rows are claimed with FOR UPDATE SKIP LOCKED, so concurrent runs (manual
+     * trigger, other replicas) never fold the same memory twice.
+     */
+    async compactTenant(tenantId: string): Promise<CompactionResult> {
+        const result: CompactionResult = { tenantId, merged: 0, kept: 0, expired: 0, evicted: 0 };
+
+        for (let i = 0; i < BATCH_SIZE; i++) {
+            const outcome = await this.prisma.$transaction(async (tx): Promise<'merged' | 'kept' | null> => {
+                const [doc] = await tx.$queryRaw<Array<{
+                    id: string;
+                    source_event_id: string;
+                    metadata: any;
+                    occurrence_count: number;
+                }>>`
+          SELECT id, source_event_id::text, metadata, occurrence_count
+          FROM memory_documents
+          WHERE tenant_id = ${tenantId}::uuid
+            AND compacted_at IS NULL
+          ORDER BY created_at
+          LIMIT 1
+          FOR UPDATE SKIP LOCKED
+        `;
+
+                if (!doc) {
+                    return null;
+                }
+
+                const [match] = await tx.$queryRaw<Array<{
+                    id: string;
+                    similarity: number;
+                    metadata: any;
+                    occurrence_count: number;
+                    created_at: Date;
+                }>>`
+          WITH doc AS (SELECT embedding FROM memory_documents WHERE id = ${doc.id}::uuid)
+          SELECT m.id, m.metadata, m.occurrence_count, m.created_at,
+                 1 - (m.embedding <=> doc.embedding) AS similarity
+          FROM memory_documents m, doc
+          WHERE m.tenant_id = ${tenantId}::uuid
+            AND m.compacted_at IS NOT NULL
+            AND m.embedding IS NOT NULL
+            AND doc.embedding IS NOT NULL
+          ORDER BY m.embedding <=> doc.embedding
+          LIMIT 1
+          FOR UPDATE OF m
+        `;
+
+                if (!match || match.similarity < SIMILARITY_THRESHOLD) {
+                    await tx.$executeRaw`
+            UPDATE memory_documents SET compacted_at = NOW() WHERE id = ${doc.id}::uuid
+          `;
+                    return 'kept';
+                }
+
+                const repMetadata = match.metadata || {};
+                const docMetadata = doc.metadata || {};
+                const occurrenceCount = match.occurrence_count + doc.occurrence_count;
+                const metadata = {
+                    ...docMetadata,
+                    occurrenceCount,
+                    firstSeenAt: repMetadata.firstSeenAt ?? match.created_at,
+                    mergedSourceEventIds: [
+                        ...(repMetadata.mergedSourceEventIds || []),
+                        ...(docMetadata.mergedSourceEventIds || []),
+                        doc.source_event_id,
+                    ].slice(-MAX_MERGED_IDS),
+                };
+
+                // Representative keeps its id and source event; newest resolution wins
+                await tx.$executeRaw`
+          UPDATE memory_documents rep
+          SET content = doc.content,
+              embedding = (
+                  SELECT array_agg(
+                      (u.a * rep.occurrence_count + u.b * doc.occurrence_count)
+                          / (rep.occurrence_count + doc.occurrence_count)
+                      ORDER BY u.ord
+                  )::vector
+                  FROM unnest(rep.embedding::real[], doc.embedding::real[]) WITH ORDINALITY AS u(a, b, ord)
+              ),
+              ticket_id = COALESCE(doc.ticket_id, rep.ticket_id),
+              occurrence_count = rep.occurrence_count + doc.occurrence_count,
+              last_seen_at = GREATEST(rep.last_seen_at, doc.last_seen_at),
+              compacted_at = NOW(),
+              metadata = ${JSON.stringify(metadata)}::jsonb
+          FROM memory_documents doc
+          WHERE rep.id = ${match.id}::uuid
+            AND doc.id = ${doc.id}::uuid
+        `;
+                await tx.$executeRaw`DELETE FROM memory_documents WHERE id = ${doc.id}::uuid`;
+                await tx.$executeRaw`
+          INSERT INTO retired_memory_events (tenant_id, source_event_id, reason)
+          VALUES (${tenantId}::uuid, ${doc.source_event_id}::uuid, 'MERGED')
+          ON CONFLICT DO NOTHING
+        `;
+                return 'merged';
+            });
+
+            if (outcome === null) {
+                break;
+            }
+            result[outcome]++;
+        }
+
+        // Dropped source events are retired too, so a replay doesn't store them again
+        const [expired] = await this.prisma.$queryRaw<Array<{ count: number }>>`
+      WITH gone AS (
+        DELETE FROM memory_documents
+        WHERE tenant_id = ${tenantId}::uuid
+          AND compacted_at IS NOT NULL
+          AND last_seen_at < NOW() - make_interval(days => ${RETENTION_DAYS}::int)
+        RETURNING tenant_id, source_event_id
+      ), retired AS (
+        INSERT INTO retired_memory_events (tenant_id, source_event_id, reason)
+        SELECT tenant_id, source_event_id, 'EXPIRED' FROM gone
+        ON CONFLICT DO NOTHING
+      )
+      SELECT COUNT(*)::int AS count FROM gone
+    `;
+        result.expired = expired.count;
+
+        const [evicted] = await this.prisma.$queryRaw<Array<{ count: number }>>`
+      WITH gone AS (
+        DELETE FROM memory_documents
+        WHERE id IN (
+          SELECT id FROM memory_documents
+          WHERE tenant_id = ${tenantId}::uuid
+            AND compacted_at IS NOT NULL
+          ORDER BY last_seen_at DESC, occurrence_count DESC
+          OFFSET ${MAX_PER_TENANT}
+        )
+        RETURNING tenant_id, source_event_id
+      ), retired AS (
+        INSERT INTO retired_memory_events (tenant_id, source_event_id, reason)
+        SELECT tenant_id, source_event_id, 'EVICTED' FROM gone
+        ON CONFLICT DO NOTHING
+      )
+      SELECT COUNT(*)::int AS count FROM gone
+    `;
+        result.evicted = evicted.count;
+
+        return result;
+    }
+}
@@ -14,6 +14,8 @@ import { z } from 'zod';
 import {
     getTicketContext,
     claimEvent,
+    findProcessedEvents,
+    listProcessedEvents,
     createActionProposals,
     storeMemory,
     searchMemory,
@@ -67,6 +69,32 @@ mcpServer.tool(
     }
 );
 
+mcpServer.tool(
+    'find_processed_events',
+    'Returns which of the given event IDs a consumer has already claimed (does not claim)',
+    {
+        consumer_name: z.string().describe('Name of the consumer'),
+        event_ids: z.array(z.string()).describe('Event UUIDs to look up'),
+    },
+    async ({ consumer_name, event_ids }) => {
+        const result = await findProcessedEvents(consumer_name, event_ids);
+        return { content: [{ type: 'text', text: JSON.stringify(result) }] };
+    }
+);
+
+mcpServer.tool(
+    'list_processed_events',
+    'Lists the most recently claimed event IDs for a consumer',
+    {
+        consumer_name: z.string().describe('Name of the consumer'),
+        limit: z.number().default(10000).describe('Maximum number of event IDs'),
+    },
+    async ({ consumer_name, limit }) => {
+        const result = await listProcessedEvents(consumer_name, limit);
+        return { content: [{ type: 'text', text: JSON.stringify(result) }] };
+    }
+);
+
 mcpServer.tool(
     'create_action_proposals',
     'Creates AI action proposals for a ticket. Auto-executes APPLY_TRIAGE if confidence >= 0.90.',
@@ -74,6 +102,7 @@ mcpServer.tool(
         tenant_id: z.string().describe('The tenant UUID'),
         ticket_id: z.string().describe('The ticket UUID'),
         correlation_id: z.string().describe('The correlation ID'),
+        idempotency_key: z.string().optional().describe('Caller key (e.g. source event ID); retries with the same key return the original proposals'),
         proposals: z.array(z.object({
             action_type: z.string(),
             confidence: z.number(),
@@ -85,8 +114,8 @@ mcpServer.tool(
             }),
         })),
     },
-    async ({ tenant_id, ticket_id, correlation_id, proposals }) => {
-        const result = await createActionProposals(tenant_id, ticket_id, correlation_id, proposals);
+    async ({ tenant_id, ticket_id, correlation_id, proposals, idempotency_key }) => {
+        const result = await createActionProposals(tenant_id, ticket_id, correlation_id, proposals, idempotency_key);
         return { content: [{ type: 'text', text: JSON.stringify(result) }] };
     }
 );
@@ -199,10 +228,30 @@ app.post('/tools/claim_event', async (req, res) => {
     }
 });
 
+app.post('/tools/find_processed_events', async (req, res) => {
+    try {
+        const { consumer_name, event_ids = [] } = req.body;
+        const result = await findProcessedEvents(consumer_name, event_ids);
+        res.json(result);
+    } catch (error: any) {
+        res.status(500).json({ error: error.message, event_ids: [] });
+    }
+});
+
+app.post('/tools/list_processed_events', async (req, res) => {
+    try {
+        const { consumer_name, limit = 10000 } = req.body;
+        const result = await listProcessedEvents(consumer_name, limit);
+        res.json(result);
+    } catch (error: any) {
+        res.status(500).json({ error: error.message, event_ids: [] });
+    }
+});
+
 app.post('/tools/create_action_proposals', async (req, res) => {
     try {
-        const { tenant_id, ticket_id, correlation_id, proposals } = req.body;
-        const result = await createActionProposals(tenant_id, ticket_id, correlation_id, proposals);
+        const { tenant_id, ticket_id, correlation_id, proposals, idempotency_key } = req.body;
+        const result = await createActionProposals(tenant_id, ticket_id, correlation_id, proposals, idempotency_key);
         res.json(result);
     } catch (error: any) {
         res.status(500).json({ error: error.message });
@@ -236,5 +285,5 @@ app.post('/tools/search_memory', async (req, res) => {
 const PORT = process.env.PORT || 3001;
 app.listen(PORT, () => {
     console.log(`[MCP] Server running on http://localhost:${PORT}`);
-    console.log('[MCP] Tools: get_ticket_context, claim_event, create_action_proposals, store_memory, search_memory');
+    console.log('[MCP] Tools: get_ticket_context, claim_event, find_processed_events, list_processed_events, create_action_proposals, store_memory, search_memory');
 });
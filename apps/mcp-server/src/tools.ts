@@ -62,23 +62,64 @@ export async function claimEvent(
     }
 }
 
+export async function findProcessedEvents(
+    consumerName: string,
+    eventIds: string[]
+): Promise<{ event_ids: string[] }> {
+    if (eventIds.length === 0) {
+        return { event_ids: [] };
+    }
+
+    // Read-only lookup: callers still claim each event right before handling it
+    const rows = await prisma.processedEvent.findMany({
+        where: { consumerName, eventId: { in: eventIds } },
+        select: { eventId: true },
+    });
+    return { event_ids: rows.map(r => r.eventId) };
+}
+
+export async function listProcessedEvents(
+    consumerName: string,
+    limit: number = 10000
+): Promise<{ event_ids: string[] }> {
+    const rows = await prisma.processedEvent.findMany({
+        where: { consumerName },
+        orderBy: { claimedAt: 'desc' },
+        take: limit,
+        select: { eventId: true },
+    });
+    return { event_ids: rows.map(r => r.eventId) };
+}
+
 export async function createActionProposals(
     tenantId: string,
     ticketId: string,
     correlationId: string,
-    proposals: ProposalInput[]
+    proposals: ProposalInput[],
+    idempotencyKey?: string
 ): Promise<{ proposals: ProposalResult[] }> {
     const results: ProposalResult[] = [];
 
     for (const proposal of proposals) {
         const shouldAutoExecute =
             proposal.action_type === 'APPLY_TRIAGE' && proposal.confidence >= 0.90;
+        // One proposal per (caller key, action type): retried calls return the original
+        const proposalKey = idempotencyKey ? `${idempotencyKey}:${proposal.action_type}` : null;
+
+        if (proposalKey) {
+            const existing = await findProposalByKey(tenantId, proposalKey);
+            if (existing) {
+                results.push(existing);
+                continue;
+            }
+        }
 
         const result = await prisma.$transaction(async (tx) => {
             const created = await tx.aIActionProposal.create({
                 data: {
                     tenantId,
                     ticketId,
+                    idempotencyKey: proposalKey,
                     actionType: proposal.action_type,
                     confidence: proposal.confidence,
                     reasoning: proposal.reasoning,
@@ -138,8 +179,19 @@ export async function createActionProposals(
             }
 
             return created;
+        }).catch(async (error: any) => {
+            // Lost a race with a concurrent retry of the same call
+            if (proposalKey && error.code === 'P2002') {
+                return null;
+            }
+            throw error;
         });
 
+        if (!result) {
+            results.push((await findProposalByKey(tenantId, proposalKey!))!);
+            continue;
+        }
+
         results.push({
             id: result.id,
             status: result.status,
@@ -150,6 +202,20 @@ export async function createActionProposals(
     return { proposals: results };
 }
 
+async function findProposalByKey(tenantId: string, idempotencyKey: string): Promise<ProposalResult | null> {
+    const existing = await prisma.aIActionProposal.findUnique({
+        where: { tenantId_idempotencyKey: { tenantId, idempotencyKey } },
+    });
+    if (!existing) {
+        return null;
+    }
+    return {
+        id: existing.id,
+        status: existing.status,
+        autoExecuted: existing.status === 'EXECUTED' && existing.decidedAt === null,
+    };
+}
+
 export async function storeMemory(
     tenantId: string,
     sourceEventId: string,
@@ -169,6 +235,18 @@ export async function storeMemory(
             return { success: true, skipped: true, reason: 'Already stored', id: existing.id };
         }
 
+        // Compaction may have folded this event into a representative, or retention dropped it
+        const [retired] = await prisma.$queryRaw<Array<{ reason: string }>>`
+            SELECT reason FROM retired_memory_events
+            WHERE tenant_id = ${tenantId}::uuid
+              AND source_event_id = ${sourceEventId}::uuid
+        `;
+
+        if (retired) {
+            const reason = retired.reason === 'MERGED' ? 'Already compacted' : 'Already retired';
+            return { success: true, skipped: true, reason };
+        }
+
         const id = crypto.randomUUID();
         const embeddingStr = `[${embedding.join(',')}]`;
 
@@ -197,7 +275,7 @@ export async function searchMemory(
     tenantId: string,
     queryEmbedding: number[],
     topK: number = 5
-): Promise<{ results: Array<{ id: string; content: string; metadata: any; similarity: number }>; error?: string }> {
+): Promise<{ results: Array<{ id: string; content: string; metadata: any; similarity: number; occurrenceCount: number; lastSeenAt: Date }>; error?: string }> {
     try {
         const embeddingStr = `[${queryEmbedding.join(',')}]`;
 
@@ -206,11 +284,15 @@ export async function searchMemory(
             content: string;
             metadata: any;
             similarity: number;
+            occurrence_count: number;
+            last_seen_at: Date;
         }>>`
             SELECT 
                 id,
                 content,
                 metadata,
+                occurrence_count,
+                last_seen_at,
                 1 - (embedding <=> ${embeddingStr}::vector) as similarity
             FROM memory_documents
             WHERE tenant_id = ${tenantId}::uuid
@@ -225,6 +307,8 @@ export async function searchMemory(
                 content: r.content,
                 metadata: r.metadata,
                 similarity: r.similarity,
+                occurrenceCount: r.occurrence_count,
+                lastSeenAt: r.last_seen_at,
             }))
         };
     } catch (error: any) {